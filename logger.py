@@ -59,6 +59,12 @@ def setup_logger(log_file_name=None):
     logger.addHandler(file_handler)
     logger.addHandler(console_handler)
     
+    # MongoDB module messages go to the same file and console
+    db_logger = logging.getLogger('mongo_db')
+    db_logger.setLevel(logging.INFO)
+    db_logger.handlers = [file_handler, console_handler]
+    db_logger.propagate = False
+    
     return logger, log_file_path
 
 
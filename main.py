@@ -1,6 +1,7 @@
 import os
 import time
 import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from automation import automate_mt5_report
 from parse import parse_mt5_report
@@ -19,13 +20,37 @@ SERVER = config.SERVER
 logger = None
 
 
-def process_single_account(account, mongo_db=None):
+def save_to_mongodb(mongo_db, parsed_data, account):
+    """
+    Save parsed report data to MongoDB and update the credential status
+    
+    Args:
+        mongo_db: MT5MongoDB instance
+        parsed_data: Dictionary from parse_mt5_report function
+        account: Dictionary with login and credential key
+    """
+    login = account['login']
+    try:
+        mongo_db.insert_or_update_account(parsed_data)
+        logger.info(f"Data saved to MongoDB for account {login}")
+        
+        # Update credential status after successful processing
+        credential_key = account.get('key')
+        mongo_db.update_credential_status(login, key=credential_key)
+        
+    except Exception as e:
+        logger.error(f"ERROR: MongoDB save failed for account {login}: {e}")
+        # Continue even if MongoDB fails
+
+
+def process_single_account(account, mongo_db=None, db_writer=None):
     """
     Process a single trading account: automate, parse, and save to MongoDB
     
     Args:
         account: Dictionary with login, password, server
         mongo_db: MT5MongoDB instance (optional)
+        db_writer: Executor to run the MongoDB save on (optional, saves inline if None)
         
     Returns:
         True if successful, False otherwise
@@ -67,17 +92,10 @@ def process_single_account(account, mongo_db=None):
     
     # Step 4: Save to MongoDB
     if mongo_db:
-        try:
-            mongo_db.insert_or_update_account(parsed_data)
-            logger.info(f"Data saved to MongoDB for account {login}")
-            
-            # Update credential status after successful processing
-            credential_key = account.get('key')
-            mongo_db.update_credential_status(login, key=credential_key)
-            
-        except Exception as e:
-            logger.error(f"ERROR: MongoDB save failed for account {login}: {e}")
-            # Continue even if MongoDB fails
+        if db_writer:
+            db_writer.submit(save_to_mongodb, mongo_db, parsed_data, account)
+        else:
+            save_to_mongodb(mongo_db, parsed_data, account)
     
     # Step 5: (Optional) Export structured JSON locally
     if SAVE_JSON_FILES:
@@ -93,6 +111,59 @@ def process_single_account(account, mongo_db=None):
     return True
 
 
+def process_accounts(accounts, mongo_db):
+    """
+    Run the automation for every account, saving reports to MongoDB
+    
+    Args:
+        accounts: List of account dictionaries from get_active_credentials
+        mongo_db: MT5MongoDB instance
+    
+    Returns:
+        Dictionary with 'success' and 'failed' lists of logins
+    """
+    # MongoDB writes run on a background worker so their network round-trips
+    # overlap with the next account's automation (MT5 can only run one login at a time)
+    db_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="mongo-writer")
+    try:
+        # Process each account
+        results = {
+            'success': [],
+            'failed': []
+        }
+        
+        for i, account in enumerate(accounts, 1):
+            logger.info("")
+            logger.info("=" * 80)
+            logger.info(f"Processing account {i}/{len(accounts)}")
+            logger.info(f"Key: {account.get('key', 'N/A')} | Login: {account['login']}")
+            if account.get('assignedTo'):
+                logger.info(f"Assigned to: {account['assignedTo']}")
+            logger.info("=" * 80)
+            
+            success = process_single_account(account, mongo_db, db_writer)
+            
+            if success:
+                results['success'].append(account['login'])
+            else:
+                results['failed'].append(account['login'])
+            
+            # Add spacing between accounts
+            logger.info("")
+            logger.info("-" * 80)
+            
+            # Wait between accounts to avoid issues
+            if i < len(accounts):
+                logger.info(f"Waiting {INTER_ACCOUNT_DELAY} seconds before processing next account...")
+                time.sleep(INTER_ACCOUNT_DELAY)
+                logger.info("")
+    finally:
+        # Wait for pending MongoDB writes before the connection is closed
+        db_writer.shutdown(wait=True)
+    
+    return results
+
+
 def main():
     """Main function to process all accounts"""
     global logger
@@ -123,55 +194,24 @@ def main():
         logger.error("ERROR: Cannot continue without MongoDB connection (credentials are stored there)")
         return
     
-    # Fetch active credentials from MongoDB
-    logger.info("Fetching active credentials from MongoDB...")
-    ACCOUNTS = mongo_db.get_active_credentials(server_name=SERVER)
-    
-    if not ACCOUNTS:
-        logger.error("ERROR: No active credentials found in MongoDB!")
-        logger.error("Please ensure credentials are added to the 'test/credentialkeys' collection")
-        if mongo_db:
-            mongo_db.close()
-        return
-    
-    logger.info(f"Total active accounts to process: {len(ACCOUNTS)}")
-    logger.info("")
-    
-    # Process each account
-    results = {
-        'success': [],
-        'failed': []
-    }
-    
-    for i, account in enumerate(ACCOUNTS, 1):
-        logger.info("")
-        logger.info("=" * 80)
-        logger.info(f"Processing account {i}/{len(ACCOUNTS)}")
-        logger.info(f"Key: {account.get('key', 'N/A')} | Login: {account['login']}")
-        if account.get('assignedTo'):
-            logger.info(f"Assigned to: {account['assignedTo']}")
-        logger.info("=" * 80)
-        
-        success = process_single_account(account, mongo_db)
+    try:
+        # Fetch active credentials from MongoDB
+        logger.info("Fetching active credentials from MongoDB...")
+        ACCOUNTS = mongo_db.get_active_credentials(server_name=SERVER)
         
-        if success:
-            results['success'].append(account['login'])
-        else:
-            results['failed'].append(account['login'])
+        if not ACCOUNTS:
+            logger.error("ERROR: No active credentials found in MongoDB!")
+            logger.error("Please ensure credentials are added to the 'test/credentialkeys' collection")
+            return
         
-        # Add spacing between accounts
+        logger.info(f"Total active accounts to process: {len(ACCOUNTS)}")
         logger.info("")
-        logger.info("-" * 80)
         
-        # Wait between accounts to avoid issues
-        if i < len(ACCOUNTS):
-            logger.info(f"Waiting {INTER_ACCOUNT_DELAY} seconds before processing next account...")
-            time.sleep(INTER_ACCOUNT_DELAY)
-            logger.info("")
-    
-    # Close MongoDB connection
-    if mongo_db:
+        results = process_accounts(ACCOUNTS, mongo_db)
+    finally:
+        # Runs on every exit path; close() alone leaves the shared client open
         mongo_db.close()
+        MT5MongoDB.shutdown_all()
         logger.info("MongoDB connection closed.")
     
     # Log FINAL SUMMARY
@@ -1,19 +1,143 @@
 """
 MongoDB integration module for MT5 trading account data
 """
+import hashlib
+import logging
 import os
+import sys
+import threading
+import time
 from datetime import datetime, timedelta, timezone
+import bson
+import numpy as np
 from pymongo import MongoClient, UpdateOne
-from pymongo.errors import ConnectionFailure, DuplicateKeyError
+from pymongo.errors import ConnectionFailure, PyMongoError
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; the NumPy path below is used without it
+    njit = None
+
+log = logging.getLogger(__name__)
+
+# MongoClient instances shared per connection string, so repeated MT5MongoDB()
+# construction reuses an established connection pool instead of reconnecting
+_CLIENT_CACHE = {}
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_EPOCH_DATE = _EPOCH.date()
+
+
+def _compile_kernel(func):
+    """
+    numba-compile func, caching it on disk when numba can locate the source.
+    Frozen or zipped builds have no cache locator; those compile in memory
+    instead. Returns None (NumPy fallback) when numba is missing or rejects func.
+    """
+    if njit is None:
+        return None
+    try:
+        return njit(cache=True)(func)
+    except Exception as e:
+        log.debug("numba on-disk cache unavailable for %s: %s", func.__name__, e)
+    try:
+        return njit(func)
+    except Exception as e:
+        log.warning("numba could not compile %s (%s); using the NumPy scan instead", func.__name__, e)
+        return None
+
+
+def _drawdown_scan_kernel(timestamps, max_values, equities, day_ids, starts, ends,
+                          threshold_factor, initial_balance):
+    """
+    Compiled per-day daily drawdown scan over flat chart arrays.
+
+    Returns (breach_day, breach_idx, reference_idx, peak, max_dd_pct, last_reference_idx)
+    for the worst breach; breach_day is -1 when no day breached and a
+    reference index of -1 means the day had no point at or before midnight.
+    """
+    worst_amount = 0.0
+    breach_day = -1
+    breach_idx = -1
+    breach_reference_idx = -1
+    breach_peak = 0.0
+    breach_max_dd = 0.0
+    reference_idx = -1
+
+    for i in range(starts.size):
+        reference_idx = np.searchsorted(timestamps, day_ids[starts[i]] * 86400, side="right") - 1
+        if reference_idx >= 0:
+            reference = max_values[reference_idx]
+        elif i == 0 and initial_balance > 0:
+            reference = initial_balance
+        else:
+            continue
+
+        if reference <= 0:
+            continue
+
+        threshold = reference * threshold_factor
+        peak = reference
+        max_dd = 0.0
+        first = -1
+        first_peak = 0.0
+        for j in range(starts[i], ends[i]):
+            equity = equities[j]
+            if equity > peak:
+                peak = equity
+            dd = (peak - equity) / peak
+            if dd > max_dd:
+                max_dd = dd
+            if first < 0 and equity < threshold:
+                first = j
+                first_peak = peak
+
+        if first >= 0:
+            amount = threshold - equities[first]
+            if breach_day < 0 or amount > worst_amount:
+                worst_amount = amount
+                breach_day = i
+                breach_idx = first
+                breach_reference_idx = reference_idx
+                breach_peak = first_peak
+                breach_max_dd = max_dd
+
+    return breach_day, breach_idx, breach_reference_idx, breach_peak, breach_max_dd, reference_idx
+
+
+_drawdown_scan_kernel = _compile_kernel(_drawdown_scan_kernel)
+
+
+def _disable_drawdown_kernel(error):
+    """Fall back to the NumPy drawdown scan for the rest of the run after a kernel failure."""
+    global _drawdown_scan_kernel
+    if _drawdown_scan_kernel is not None:
+        _drawdown_scan_kernel = None
+        log.warning("numba drawdown kernel failed (%s); using the NumPy scan instead", error)
 
 
 class MT5MongoDB:
-    """Handler for MongoDB operations related to MT5 trading accounts"""
+    """
+    Handler for MongoDB operations related to MT5 trading accounts
+
+    credentialkeys stores credentials.loginId as a number; normalize_login_ids()
+    converts legacy string loginIds. Lookups still fall back to the string form
+    for documents written before the migration.
+    """
 
     STATUS_ACTIVE = "ACTIVE"
     STATUS_BREACHED = "BREACHED"
     STATUS_UNDER_REVIEW = "UNDER REVIEW"
 
+    # (connection string, database) pairs whose indexes were created in this process
+    _INDEXES_ENSURED = set()
+    # (connection string, database) -> name of the credentialkeys loginId index, used as a query hint
+    _LOGIN_INDEX_NAMES = {}
+
+    # Credential key lookups (hits and misses) are cached in-process
+    CREDENTIAL_KEY_CACHE_TTL = 300  # seconds
+    CREDENTIAL_KEY_CACHE_SIZE = 4096
+
     RULES = {
         "2_STEP_PHASE_1": {
             "profit_target": 0.08,
@@ -40,6 +164,143 @@ class MT5MongoDB:
             "max_inactivity_days": 14,
         },
     }
+
+    # Document layout built by transform_mt5_data: (section, ((field, default), ...)).
+    # Fields of the "account" section are stored at the top level of the document.
+    _SCHEMA_TEMPLATE = (
+        ('account', (
+            ('name', ''), ('currency', 'USD'), ('type', 'demo'), ('broker', ''),
+            ('account', 0), ('digits', 2),
+        )),
+        ('summary', (
+            ('gain', 0), ('activity', 0), ('deposit', [0, 0]), ('withdrawal', [0, 0]),
+            ('dividend', 0), ('correction', 0), ('credit', 0),
+        )),
+        ('summaryIndicators', (
+            ('sharp_ratio', None), ('profit_factor', None), ('recovery_factor', None),
+            ('drawdown', None), ('deposit_load', None), ('trades_per_week', None),
+            ('hold_time', None),
+        )),
+        ('balance', (
+            ('balance', 0), ('equity', 0), ('period', 0), ('chart', []),
+            ('table', {'years': [], 'total': 0}),
+        )),
+        ('growth', (
+            ('growth', 0), ('drawdown', 0), ('period', 0), ('chart', []),
+            ('table', {'years': [], 'total': 0}),
+        )),
+        ('dividend', (
+            ('dividend', 0), ('correction', 0), ('credit', 0), ('period', 0), ('chart', []),
+            ('table', {'years': [], 'total': 0}),
+        )),
+        ('profitTotal', (
+            ('profit', 0), ('profit_gross', 0), ('profit_dividend', 0), ('profit_swap', 0),
+            ('loss', 0), ('loss_gross', 0), ('loss_commission', 0),
+        )),
+        ('profitMoney', (
+            ('period', 0), ('profit', []), ('loss', []), ('table', {'years': [], 'total': 0}),
+        )),
+        ('profitDeals', (
+            ('period', 0), ('profit', []), ('loss', []), ('table', {'years': [], 'total': 0}),
+        )),
+        ('profitDaily', (
+            ('chart', []),
+        )),
+        ('profitType', (
+            ('robot', {'x': 0, 'y': [0, 0]}), ('manual', {'x': 0, 'y': [0, 0]}),
+            ('signals', {'x': 0, 'y': [0, 0]}),
+        )),
+        ('longShortTotal', (
+            ('long', 0), ('short', 0),
+        )),
+        ('longShort', (
+            ('period', 0), ('long', []), ('short', []), ('all', []),
+        )),
+        ('longShortDaily', (
+            ('chart', []),
+        )),
+        ('longShortIndicators', (
+            ('netto_pl', [0, 0]), ('average_pl', [0, 0]), ('average_pl_percent', [0, 0]),
+            ('commissions', [0, 0]), ('average_profit', [0, 0]), ('average_profit_percent', [0, 0]),
+            ('trades', [0, 0]), ('win_trades', [0, 0]),
+        )),
+        ('tradeTypeTotal', (
+            ('robots', 0), ('manual', 0), ('signals', 0),
+        )),
+        ('symbolMoney', (
+            ('period', 0), ('chart', []),
+        )),
+        ('symbolDeals', (
+            ('period', 0), ('chart', []),
+        )),
+        ('symbolIndicators', (
+            ('profit_factor', []), ('netto_profit', []), ('fees', []),
+        )),
+        ('symbolsTotal', (
+            ('total', []),
+        )),
+        ('symbolTypes', (
+            ('type', []),
+        )),
+        ('drawdown', (
+            ('drawdown', 0), ('deposit_load', 0), ('period', 0), ('chart', []),
+        )),
+        ('risksIndicators', (
+            ('profit', [0, 0]), ('max_consecutive_trades', [0, 0]), ('max_consecutive_profit', [0, 0]),
+        )),
+        ('risksMfeMaePercent', (
+            ('max_avg_profit_ratio', 0), ('max_avg_mfe_ratio', 0), ('min_avg_loss_ratio', 0),
+            ('min_avg_mae_ratio', 0), ('period', 0), ('chart', []),
+        )),
+        ('risksMfeMaeMoney', (
+            ('max_avg_profit', 0), ('max_avg_mfe', 0), ('min_avg_loss', 0),
+            ('min_avg_mae', 0), ('period', 0), ('chart', []),
+        )),
+    )
+
+    # Marks the positionally matched credential as checked
+    _CREDENTIAL_CHECKED_UPDATE = {
+        "$set": {
+            "credentials.$.isBreached": False,
+            "credentials.$.breachedMetadata": "will be known soon"
+        },
+        # Timestamps are filled in by the server at write time
+        "$currentDate": {
+            "credentials.$.lastChecked": True,
+            "updatedAt": True
+        }
+    }
+
+    # Max-loss threshold multipliers (1 - limit) per program, filled in once by _prepare_rules()
+    # (the daily factor is derived inside the drawdown check, which also takes bare limits)
+    RULE_FACTORS = {}
+
+    @classmethod
+    def _prepare_rules(cls):
+        """Precompute the max-loss threshold multiplier for every rule set"""
+        for program, rules in cls.RULES.items():
+            cls.RULE_FACTORS[program] = {
+                "max_loss": 1 - rules["max_loss_limit"],
+            }
+    
+    @classmethod
+    def _compile_template(cls):
+        """
+        Generate the document builder for _SCHEMA_TEMPLATE once at import.
+        Defaults are emitted as literals, so every call gets fresh lists/dicts.
+        """
+        lines = ["def _build_document(parsed_data):"]
+        entries = []
+        for i, (section, fields) in enumerate(cls._SCHEMA_TEMPLATE):
+            lines.append(f"    s{i} = parsed_data.get({section!r}, {{}})")
+            body = ", ".join(f"{field!r}: s{i}.get({field!r}, {default!r})" for field, default in fields)
+            # Account fields live at the top level of the document
+            entries.append(body if section == 'account' else f"{section!r}: {{{body}}}")
+        lines.append("    return {" + ", ".join(entries) + "}")
+
+        namespace = {}
+        exec("\n".join(lines), namespace)
+        cls._build_document = staticmethod(namespace["_build_document"])
     
     def __init__(self, connection_string=None, database_name="test"):
         """
@@ -52,18 +313,95 @@ class MT5MongoDB:
         if connection_string is None:
             connection_string = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/')
         
-        self.client = MongoClient(connection_string)
+        self.client = _CLIENT_CACHE.get(connection_string)
+        if self.client is None:
+            client = MongoClient(
+                connection_string,
+                maxPoolSize=int(os.getenv('MONGO_MAX_POOL', '50')),
+                minPoolSize=int(os.getenv('MONGO_MIN_POOL', '5')),
+                waitQueueTimeoutMS=5000,
+                maxIdleTimeMS=60000,
+                serverSelectionTimeoutMS=3000,
+                compressors='zstd,zlib',
+                retryWrites=True,
+                retryReads=True
+            )
+            
+            # Test connection once per client; later instances reuse the verified pool
+            try:
+                client.admin.command('ping')
+            except ConnectionFailure:
+                log.error("MongoDB connection failed!")
+                client.close()
+                raise
+            self.client = _CLIENT_CACHE.setdefault(connection_string, client)
+            if self.client is not client:
+                # Another instance cached a client for this URI first; don't leak ours
+                client.close()
+        
         self.db = self.client[database_name]
         self.collection = self.db['credentials_reports']
         self.credentials_collection = self.db['credentialkeys']
         
-        # Test connection
+        # account number -> (credential key, expires_at)
+        self._credential_key_cache = {}
+        self._credential_key_lock = threading.Lock()
+        
+        # account number -> sectionHashes this handler last wrote for it
+        self._section_hash_cache = {}
+        
+        # Stored loginId type (True = string, False = number), learned on first match
+        self._login_is_string = None
+        log.info("Connected to MongoDB: %s", database_name)
+        
+        self._ensure_indexes((connection_string, database_name))
+        # None if the index could not be created; lookups then run without a hint
+        self._loginid_index_name = self._LOGIN_INDEX_NAMES.get((connection_string, database_name))
+    
+    def _ensure_indexes(self, index_key):
+        """Create indexes for account upserts and credential lookups (once per process)"""
+        if index_key in self._INDEXES_ENSURED:
+            return
+        # Each statement is guarded on its own so one rejection doesn't skip the rest
+        # Reports embed large chart arrays; store a new collection with zstd block compression
+        self._run_ddl("create compressed collection", self._create_report_collection)
+        # loginId leads (highest cardinality) so lookups by login alone still use this index
+        self._LOGIN_INDEX_NAMES[index_key] = self._run_ddl(
+            "create loginId index", self.credentials_collection.create_index,
+            [("credentials.loginId", 1), ("key", 1)], background=True
+        )
+        # Equality on isActive first (unassigned count), then the login joined against credentials_reports
+        self._run_ddl(
+            "create isActive index", self.credentials_collection.create_index,
+            [("credentials.isActive", 1), ("credentials.loginId", 1)], background=True
+        )
+        self._run_ddl(
+            "create unique account index", self.collection.create_index,
+            [("account", 1)], unique=True, background=True
+        )
+        self._run_ddl(
+            "create summary.gain index", self.collection.create_index,
+            [("summary.gain", -1)], background=True
+        )
+        # Recorded even if a statement failed, so new handlers don't rerun the DDL and re-warn
+        self._INDEXES_ENSURED.add(index_key)
+    
+    def _create_report_collection(self):
+        """Create credentials_reports with zstd block compression if it doesn't exist yet"""
+        if not self.db.list_collection_names(filter={"name": self.collection.name}):
+            self.db.create_collection(
+                self.collection.name,
+                storageEngine={"wiredTiger": {"configString": "block_compressor=zstd"}}
+            )
+    
+    @staticmethod
+    def _run_ddl(description, func, *args, **kwargs):
+        """Run one optional DDL statement; log and return None if the server rejects it"""
         try:
-            self.client.admin.command('ping')
-            print(f"Connected to MongoDB: {database_name}")
-        except ConnectionFailure:
-            print("MongoDB connection failed!")
-            raise
+            return func(*args, **kwargs)
+        except PyMongoError as e:
+            log.warning("Could not %s: %s", description, e)
+            return None
     
     def _parse_iso_date(self, value):
         """Parse various date formats found in Mongo/MT5 payloads."""
@@ -71,49 +409,156 @@ class MT5MongoDB:
             if isinstance(value, datetime):
                 return value
             if isinstance(value, dict) and "$date" in value:
-                return datetime.fromisoformat(value["$date"].replace("Z", "+00:00")).astimezone(timezone.utc)
+                value = value["$date"]
             if isinstance(value, str):
-                return datetime.fromisoformat(value.replace("Z", "+00:00")).astimezone(timezone.utc)
+                parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+                # Values with a "Z"/+00:00 suffix are already UTC
+                if parsed.tzinfo is timezone.utc:
+                    return parsed
+                return parsed.astimezone(timezone.utc)
         except Exception:
             return None
         return None
 
+    def _login_variants(self, login_id, narrow=True):
+        """
+        Values to match credentials.loginId against (string and/or number).
+        With narrow=True, only the stored loginId type is probed once it is known.
+        """
+        variants = [str(login_id)]
+        try:
+            variants.append(int(login_id))
+        except (TypeError, ValueError):
+            return variants
+
+        if narrow and self._login_is_string is not None:
+            return variants[:1] if self._login_is_string else variants[1:]
+        return variants
+
+    def _find_credential_doc(self, login_id, projection):
+        """
+        find_one on credentialkeys for the document holding login_id.
+        The projection should include "credentials.$" so the matched credential
+        comes back as credentials[0]; its loginId type is remembered for later lookups.
+        """
+        # Pin the lookup to the loginId index instead of leaving it to the query planner
+        options = {"hint": self._loginid_index_name} if self._loginid_index_name else {}
+
+        variants = self._login_variants(login_id)
+        doc = self.credentials_collection.find_one(
+            {"credentials": {"$elemMatch": {"loginId": {"$in": variants}}}},
+            projection,
+            **options
+        )
+
+        # Narrowed probe missed: loginIds may be stored with mixed types, retry with both
+        if doc is None:
+            all_variants = self._login_variants(login_id, narrow=False)
+            if all_variants != variants:
+                doc = self.credentials_collection.find_one(
+                    {"credentials": {"$elemMatch": {"loginId": {"$in": all_variants}}}},
+                    projection,
+                    **options
+                )
+
+        if doc and doc.get("credentials"):
+            self._login_is_string = isinstance(doc["credentials"][0].get("loginId"), str)
+        return doc
+
     def _find_credential_key(self, account_number):
-        """Lookup credential key from credentialkeys collection for a login (match string or number)."""
+        """
+        Lookup credential key from credentialkeys collection for a login (match string or number).
+        Results, including misses, are cached for CREDENTIAL_KEY_CACHE_TTL seconds.
+        """
         if account_number is None:
             return None
+
+        cache_key = str(account_number)
+        now = time.monotonic()
+        with self._credential_key_lock:
+            cached = self._credential_key_cache.get(cache_key)
+        if cached and cached[1] > now:
+            return cached[0]
+
         try:
-            variants = [str(account_number)]
-            try:
-                variants.append(int(account_number))
-            except Exception:
-                pass
+            doc = self._find_credential_doc(account_number, {"_id": 0, "key": 1, "credentials.$": 1})
+        except Exception:
+            # Lookup failures are not cached so the next call retries
+            return None
+
+        key = doc["key"] if doc and doc.get("key") else None
+        with self._credential_key_lock:
+            self._cache_credential_key(cache_key, key, now)
+        return key
+
+    def _cache_credential_key(self, cache_key, key, now):
+        """Store a credential key lookup result; caller must hold _credential_key_lock"""
+        self._credential_key_cache.pop(cache_key, None)
+        if len(self._credential_key_cache) >= self.CREDENTIAL_KEY_CACHE_SIZE:
+            # Evict the oldest entry (dicts keep insertion order)
+            self._credential_key_cache.pop(next(iter(self._credential_key_cache)))
+        self._credential_key_cache[cache_key] = (key, now + self.CREDENTIAL_KEY_CACHE_TTL)
 
-            doc = self.credentials_collection.find_one(
-                {"credentials": {"$elemMatch": {"loginId": {"$in": variants}}}},
-                {"key": 1}
+    def _prefetch_credential_keys(self, account_numbers):
+        """
+        Warm the credential key cache for many logins with a single query,
+        so a batch of reports does not look up credentialkeys once per account.
+        """
+        now = time.monotonic()
+        with self._credential_key_lock:
+            wanted = set()
+            for account_number in account_numbers:
+                if account_number is None:
+                    continue
+                cached = self._credential_key_cache.get(str(account_number))
+                if not cached or cached[1] <= now:
+                    wanted.add(str(account_number))
+        if len(wanted) < 2:
+            return
+
+        variants = []
+        for login in wanted:
+            variants.extend(self._login_variants(login, narrow=False))
+
+        try:
+            docs = self.credentials_collection.find(
+                {"credentials.loginId": {"$in": variants}},
+                {"_id": 0, "key": 1, "credentials.loginId": 1}
             )
-            if doc and doc.get("key"):
-                return doc["key"]
-        except Exception:
-            pass
-        return None
+            found = {}
+            for doc in docs:
+                for cred in doc.get("credentials", []):
+                    login = str(cred.get("loginId"))
+                    # First matching document wins, like find_one
+                    if login in wanted and login not in found:
+                        found[login] = doc.get("key") or None
+        except PyMongoError:
+            # Leave the cache cold; per-account lookups will retry
+            return
+
+        with self._credential_key_lock:
+            for login in wanted:
+                self._cache_credential_key(login, found.get(login), now)
+
+    def invalidate_credential_key(self, account_number=None):
+        """
+        Drop cached credential key lookups
+        
+        Args:
+            account_number: Login to invalidate (clears the whole cache if None)
+        """
+        with self._credential_key_lock:
+            if account_number is None:
+                self._credential_key_cache.clear()
+            else:
+                self._credential_key_cache.pop(str(account_number), None)
 
     def _find_credential_phase(self, account_number):
         """Lookup the phase from credentialkeys collection for a given login."""
         if account_number is None:
             return None
         try:
-            variants = [str(account_number)]
-            try:
-                variants.append(int(account_number))
-            except Exception:
-                pass
-
-            doc = self.credentials_collection.find_one(
-                {"credentials": {"$elemMatch": {"loginId": {"$in": variants}}}},
-                {"credentials.$": 1}
-            )
+            doc = self._find_credential_doc(account_number, {"_id": 0, "credentials.$": 1})
             if doc and doc.get("credentials") and len(doc["credentials"]) > 0:
                 return doc["credentials"][0].get("phase", "PHASE_1")
         except Exception:
@@ -156,67 +601,65 @@ class MT5MongoDB:
             return "2_STEP_PHASE_1"
         return "2_STEP_PHASE_1"
 
-    def _group_chart_by_day(self, balance_chart):
+    def _chart_arrays(self, balance_chart):
         """
-        Group balance chart points by UTC date.
-        Returns dict: {date: [list of points sorted by timestamp]}
-        Each point has: {'timestamp': datetime, 'balance': float, 'equity': float}
+        Convert balance chart points to NumPy arrays sorted by timestamp.
+        Returns (timestamps, values) where values[:, 0] is balance and values[:, 1] is equity.
+        Points without a [balance, equity] pair are skipped.
         """
-        daily_data = {}
-        
+        xs = []
+        ys = []
         for point in balance_chart:
-            ts = datetime.fromtimestamp(point.get("x", 0), tz=timezone.utc)
             y_vals = point.get("y", [0, 0])
-            
             if not isinstance(y_vals, list) or len(y_vals) < 2:
                 continue
-                
-            day_key = ts.date()
-            if day_key not in daily_data:
-                daily_data[day_key] = []
-            
-            daily_data[day_key].append({
-                'timestamp': ts,
-                'balance': float(y_vals[0] or 0),
-                'equity': float(y_vals[1] or 0)
-            })
-        
-        # Sort each day's points by timestamp
-        for day_key in daily_data:
-            daily_data[day_key].sort(key=lambda x: x['timestamp'])
-        
-        return daily_data
+            xs.append(point.get("x", 0))
+            ys.append((y_vals[0] or 0, y_vals[1] or 0))
+
+        xs = np.asarray(xs, dtype=np.int64)
+        ys = np.asarray(ys, dtype=np.float64).reshape(-1, 2)
+
+        order = np.argsort(xs, kind="stable")
+        return xs[order], ys[order]
+
+    def _day_bounds(self, timestamps):
+        """
+        Locate the per-day runs in sorted timestamps.
+        Returns (day_ids, starts, ends) with one [start, end) index pair per UTC day.
+        """
+        day_ids = timestamps // 86400
+        if not day_ids.size:
+            return day_ids, day_ids, day_ids
+
+        starts = np.flatnonzero(np.concatenate(([True], day_ids[1:] != day_ids[:-1])))
+        ends = np.append(starts[1:], len(day_ids))
+        return day_ids, starts, ends
+
+    def _split_by_day(self, timestamps, values, bounds=None):
+        """Split sorted chart arrays into {date: (timestamps, balances, equities)} slices."""
+        day_ids, starts, ends = bounds if bounds is not None else self._day_bounds(timestamps)
+
+        return {
+            _EPOCH_DATE + timedelta(days=int(day_ids[start])): (
+                timestamps[start:end], values[start:end, 0], values[start:end, 1]
+            )
+            for start, end in zip(starts, ends)
+        }
 
-    def _get_midnight_utc_value(self, day_date, daily_data):
+    def _get_midnight_utc_value(self, day_date, timestamps, max_values):
         """
         Returns max(balance, equity) at 00:00 UTC for the given day.
         Uses the latest data point AT OR BEFORE midnight.
         Never looks forward in time.
         
-        Strategy:
-        1. Search ALL points in daily_data to find the latest point <= midnight UTC
-        2. This ensures we find the point even if it's in the current day's list
+        timestamps must be the full sorted chart and max_values the matching
+        per-point max(balance, equity), so a binary search finds the point.
         """
-        midnight_utc = datetime(
-            day_date.year,
-            day_date.month,
-            day_date.day,
-            tzinfo=timezone.utc
-        )
+        midnight_utc = (day_date - _EPOCH_DATE).days * 86400
 
-        latest_point = None
-
-        # Search through ALL days to find the latest point at or before midnight
-        for date_key, points in daily_data.items():
-            for p in points:
-                # Only consider points at or before midnight UTC of target day
-                if p["timestamp"] <= midnight_utc:
-                    # Keep track of the latest point
-                    if latest_point is None or p["timestamp"] > latest_point["timestamp"]:
-                        latest_point = p
-
-        if latest_point:
-            return max(latest_point["balance"], latest_point["equity"])
+        idx = int(np.searchsorted(timestamps, midnight_utc, side="right")) - 1
+        if idx >= 0:
+            return float(max_values[idx])
 
         return None
 
@@ -233,22 +676,92 @@ class MT5MongoDB:
         if not balance_chart:
             return False, {}
 
-        daily_data = self._group_chart_by_day(balance_chart)
-        if not daily_data:
+        timestamps, values = self._chart_arrays(balance_chart)
+        return self._daily_drawdown_from_arrays(
+            timestamps, values, self._day_bounds(timestamps), daily_loss_limit, initial_balance
+        )
+
+    def _daily_drawdown_from_arrays(self, timestamps, values, bounds, daily_loss_limit, initial_balance=None):
+        """Daily drawdown check on sorted chart arrays and their day bounds (see _check_daily_drawdown)."""
+        day_ids, starts, ends = bounds
+        if not starts.size:
             return False, {}
 
+        max_values = values.max(axis=1)
+        threshold_factor = 1 - daily_loss_limit
+
+        scan_args = (timestamps, values, max_values, bounds, threshold_factor, initial_balance)
+        scan_result = None
+        if _drawdown_scan_kernel is not None:
+            # Compile errors or a stale on-disk cache entry must not drop the account write
+            try:
+                scan_result = self._scan_daily_drawdown_jit(*scan_args)
+            except Exception as e:
+                _disable_drawdown_kernel(e)
+        if scan_result is None:
+            scan_result = self._scan_daily_drawdown(*scan_args)
+        worst_breach_details, midnight_value = scan_result
+
+        current_day = _EPOCH_DATE + timedelta(days=int(day_ids[starts[-1]]))
+        current_equities = values[starts[-1]:, 1]
+        total_days = len(starts)
+
+        # --- Current day metrics ---
+        details = {
+            "total_days_checked": total_days,
+            "current_day": str(current_day),
+            "allowed_drawdown_percent": daily_loss_limit,
+        }
+
+        if current_equities.size:
+            # The scan above already looked up the last day's midnight value
+            curr_midnight = midnight_value
+
+            if curr_midnight is None:
+                curr_midnight_ref = initial_balance if initial_balance else 0
+            else:
+                curr_midnight_ref = curr_midnight
+
+            # Threshold is based on midnight reference, not rolling peak
+            curr_threshold = curr_midnight_ref * threshold_factor if curr_midnight_ref > 0 else 0
+            
+            # Track rolling peak for display
+            curr_peak = max(curr_midnight_ref, float(current_equities.max()))
+            curr_equity = float(current_equities[-1])
+            curr_dd_pct = (
+                (curr_peak - curr_equity) / curr_peak if curr_peak > 0 else 0
+            )
+
+            details.update({
+                "current_peak_equity": curr_peak,
+                "current_threshold": curr_threshold,
+                "current_equity": curr_equity,
+                "current_drawdown_percent": curr_dd_pct,
+            })
+
+        is_breached = bool(worst_breach_details)
+
+        if is_breached:
+            details.update(worst_breach_details)
+
+        return is_breached, details
+
+    def _scan_daily_drawdown(self, timestamps, values, max_values, bounds, threshold_factor, initial_balance):
+        """
+        Per-day drawdown scan in NumPy, used when numba is not installed.
+        Returns (worst_breach_details, last_day_midnight_value).
+        """
+        daily_data = self._split_by_day(timestamps, values, bounds)
         sorted_days = sorted(daily_data.keys())
 
         worst_breach_amount = None
         worst_breach_details = {}
 
         for i, day_date in enumerate(sorted_days):
-            day_points = daily_data.get(day_date, [])
-            if not day_points:
-                continue
+            day_timestamps, _, day_equities = daily_data[day_date]
 
             # --- Midnight reference (critical) ---
-            midnight_value = self._get_midnight_utc_value(day_date, daily_data)
+            midnight_value = self._get_midnight_utc_value(day_date, timestamps, max_values)
 
             # First day fallback to initial_balance ONLY if truly needed
             if midnight_value is None:
@@ -263,39 +776,26 @@ class MT5MongoDB:
                 continue
 
             # Threshold is ALWAYS based on midnight UTC value, not rolling peak
-            threshold = midnight_reference * (1 - daily_loss_limit)
+            threshold = midnight_reference * threshold_factor
             
-            # Track rolling high watermark for display/metrics
-            peak_equity = midnight_reference
-            day_breached = False
-            breach_info = None
-            max_dd_pct = 0.0
-
-            for point in day_points:
-                equity = point["equity"]
-
-                # rolling high watermark (for tracking, but threshold stays based on midnight)
-                if equity > peak_equity:
-                    peak_equity = equity
-
-                # Check breach against threshold based on midnight value
-
-                if equity < threshold and not day_breached:
-                    day_breached = True
-                    breach_info = {
-                        "breach_date": str(day_date),
-                        "timestamp": point["timestamp"],
-                        "peak_equity": peak_equity,  # Current peak (rolling high watermark)
-                        "midnight_reference": midnight_reference,  # Base value at 00:00 UTC
-                        "threshold": threshold,  # Based on midnight_reference, not peak
-                        "equity_at_breach": equity,
-                    }
+            # Rolling high watermark (for tracking, but threshold stays based on midnight)
+            peaks = np.maximum.accumulate(np.concatenate(([midnight_reference], day_equities)))[1:]
 
-                if peak_equity > 0:
-                    dd_pct = (peak_equity - equity) / peak_equity
-                    max_dd_pct = max(max_dd_pct, dd_pct)
+            # midnight_reference > 0, so every peak is positive
+            max_dd_pct = max(0.0, float(((peaks - day_equities) / peaks).max()))
 
-            if day_breached and breach_info:
+            # Check breach against threshold based on midnight value (first point below it)
+            breach_mask = day_equities < threshold
+            if breach_mask.any():
+                first = int(np.argmax(breach_mask))
+                breach_info = {
+                    "breach_date": str(day_date),
+                    "timestamp": _EPOCH + timedelta(seconds=int(day_timestamps[first])),
+                    "peak_equity": float(peaks[first]),  # Current peak (rolling high watermark)
+                    "midnight_reference": midnight_reference,  # Base value at 00:00 UTC
+                    "threshold": threshold,  # Based on midnight_reference, not peak
+                    "equity_at_breach": float(day_equities[first]),
+                }
                 breach_amount = breach_info["threshold"] - breach_info["equity_at_breach"]
 
                 if worst_breach_amount is None or breach_amount > worst_breach_amount:
@@ -306,50 +806,36 @@ class MT5MongoDB:
                         "max_drawdown_percent": max_dd_pct,
                     }
 
-        # --- Current day metrics ---
-        current_day = sorted_days[-1]
-        current_points = daily_data.get(current_day, [])
-
-        details = {
-            "total_days_checked": len(sorted_days),
-            "current_day": str(current_day),
-            "allowed_drawdown_percent": daily_loss_limit,
-        }
-
-        if current_points:
-            curr_midnight = self._get_midnight_utc_value(current_day, daily_data)
+        return worst_breach_details, midnight_value
 
-            if curr_midnight is None:
-                curr_midnight_ref = initial_balance if initial_balance else 0
-            else:
-                curr_midnight_ref = curr_midnight
-
-            # Threshold is based on midnight reference, not rolling peak
-            curr_threshold = curr_midnight_ref * (1 - daily_loss_limit) if curr_midnight_ref > 0 else 0
-            
-            # Track rolling peak for display
-            curr_peak = curr_midnight_ref
-            for p in current_points:
-                if p["equity"] > curr_peak:
-                    curr_peak = p["equity"]
-            curr_equity = current_points[-1]["equity"]
-            curr_dd_pct = (
-                (curr_peak - curr_equity) / curr_peak if curr_peak > 0 else 0
-            )
+    def _scan_daily_drawdown_jit(self, timestamps, values, max_values, bounds, threshold_factor, initial_balance):
+        """Same scan as _scan_daily_drawdown, run through the compiled numba kernel."""
+        day_ids, starts, ends = bounds
+        equities = np.ascontiguousarray(values[:, 1])
 
-            details.update({
-                "current_peak_equity": curr_peak,
-                "current_threshold": curr_threshold,
-                "current_equity": curr_equity,
-                "current_drawdown_percent": curr_dd_pct,
-            })
+        breach_day, breach_idx, reference_idx, peak, max_dd_pct, last_reference_idx = _drawdown_scan_kernel(
+            timestamps, max_values, equities, day_ids, starts, ends,
+            threshold_factor, float(initial_balance) if initial_balance else 0.0,
+        )
 
-        is_breached = worst_breach_amount is not None
+        midnight_value = float(max_values[last_reference_idx]) if last_reference_idx >= 0 else None
+        if breach_day < 0:
+            return {}, midnight_value
 
-        if is_breached:
-            details.update(worst_breach_details)
+        midnight_reference = float(max_values[reference_idx]) if reference_idx >= 0 else initial_balance
+        threshold = midnight_reference * threshold_factor
+        equity_at_breach = float(equities[breach_idx])
 
-        return is_breached, details
+        return {
+            "breach_date": str(_EPOCH_DATE + timedelta(days=int(day_ids[starts[breach_day]]))),
+            "timestamp": _EPOCH + timedelta(seconds=int(timestamps[breach_idx])),
+            "peak_equity": float(peak),
+            "midnight_reference": midnight_reference,
+            "threshold": threshold,
+            "equity_at_breach": equity_at_breach,
+            "breach_amount": threshold - equity_at_breach,
+            "max_drawdown_percent": float(max_dd_pct),
+        }, midnight_value
 
     def _count_profitable_days(self, profit_daily_chart, initial_balance):
         """
@@ -359,17 +845,28 @@ class MT5MongoDB:
         if not initial_balance or initial_balance <= 0:
             return 0
         
+        if not profit_daily_chart:
+            return 0
+        
         min_profit_threshold = initial_balance * 0.015  # 1.5%
-        profitable = 0
         
-        for entry in profit_daily_chart or []:
+        # Fast path: rows form a plain numeric matrix
+        try:
+            y_arr = np.array([entry.get("y", []) for entry in profit_daily_chart])
+        except ValueError:
+            y_arr = None  # ragged rows
+        if y_arr is not None and y_arr.ndim == 2 and y_arr.dtype.kind in "biuf":
+            # Day is profitable if net profit >= 1.5% of initial balance
+            return int(np.count_nonzero(y_arr.sum(axis=1) >= min_profit_threshold))
+        
+        profitable = 0
+        for entry in profit_daily_chart:
             y_vals = entry.get("y", [])
             day_net = 0
             for val in y_vals:
                 if isinstance(val, (int, float)):
                     day_net += val
             
-            # Day is profitable if net profit >= 1.5% of initial balance
             if day_net >= min_profit_threshold:
                 profitable += 1
         
@@ -383,46 +880,62 @@ class MT5MongoDB:
         if not balance_chart or len(balance_chart) < 2:
             return False, 0
         
-        # Group points by UTC day
-        daily_equity = {}  # date -> equity value
-        for point in balance_chart:
-            ts = datetime.fromtimestamp(point.get("x", 0), tz=timezone.utc)
-            day_key = ts.date()
-            equity = point.get("y", [0, 0])[1] if isinstance(point.get("y"), list) else point.get("y", 0)
-            # Store the last equity value for each day
-            if day_key not in daily_equity:
-                daily_equity[day_key] = equity
-        
-        # Sort by date
-        sorted_dates = sorted(daily_equity.keys())
-        if len(sorted_dates) < 2:
+        timestamps, values = self._chart_arrays(balance_chart)
+        return self._inactivity_from_arrays(values, self._day_bounds(timestamps), max_inactivity_days)
+
+    def _inactivity_from_arrays(self, values, bounds, max_inactivity_days):
+        """Inactivity check on sorted chart values and their day bounds (see _check_inactivity_breach)."""
+        _, _, ends = bounds
+        if ends.size < 2:
             return False, 0
-        
-        # Check for consecutive days with same equity
-        max_consecutive = 0
-        current_consecutive = 1
-        
-        for i in range(1, len(sorted_dates)):
-            prev_date = sorted_dates[i - 1]
-            curr_date = sorted_dates[i]
-            prev_equity = daily_equity[prev_date]
-            curr_equity = daily_equity[curr_date]
-            
-            # Check if equity is unchanged (within small tolerance for floating point)
-            if abs(curr_equity - prev_equity) < 0.01:
-                current_consecutive += 1
-            else:
-                max_consecutive = max(max_consecutive, current_consecutive)
-                current_consecutive = 1
-        
-        max_consecutive = max(max_consecutive, current_consecutive)
+
+        # Last equity value of each UTC day
+        daily_equity = values[ends - 1, 1]
+
+        # Days whose equity is unchanged from the previous day (small tolerance for floating point)
+        unchanged = np.abs(np.diff(daily_equity)) < 0.01
+
+        # Longest run of unchanged days; a run of k unchanged steps spans k + 1 days
+        edges = np.diff(np.concatenate(([False], unchanged, [False])).astype(np.int8))
+        run_starts = np.flatnonzero(edges == 1)
+        run_ends = np.flatnonzero(edges == -1)
+        max_consecutive = int((run_ends - run_starts).max()) + 1 if run_starts.size else 1
         
         is_breached = max_consecutive > max_inactivity_days
         return is_breached, max_consecutive
 
+    def _analyze_balance_chart(self, balance_chart, rules, initial_balance):
+        """
+        Run every balance-chart rule on a single sorted copy of the chart.
+        Returns dict with the chart minimums (None if the chart is empty or there is
+        no initial balance to compare them with), daily drawdown result and inactivity result.
+        """
+        timestamps, values = self._chart_arrays(balance_chart)
+        bounds = self._day_bounds(timestamps)
+
+        min_balance = min_equity = None
+        if values.size and initial_balance > 0:
+            min_balance, min_equity = values.min(axis=0).tolist()
+
+        daily_dd_breached, daily_dd_details = self._daily_drawdown_from_arrays(
+            timestamps, values, bounds, rules["daily_loss_limit"], initial_balance
+        )
+        inactivity_breached, consecutive_inactive_days = self._inactivity_from_arrays(
+            values, bounds, rules["max_inactivity_days"]
+        )
+
+        return {
+            "min_balance": min_balance,
+            "min_equity": min_equity,
+            "daily_dd_breached": daily_dd_breached,
+            "daily_dd_details": daily_dd_details,
+            "inactivity_breached": inactivity_breached,
+            "consecutive_inactive_days": consecutive_inactive_days,
+        }
+
     def _evaluate_account(self, parsed_data, credential_key=None, credential_phase=None):
         """Apply breach rules and return evaluation metadata."""
-        now = datetime.utcnow().replace(tzinfo=timezone.utc)
+        now = datetime.now(timezone.utc)
         account_info = parsed_data.get("account", {})
         summary = parsed_data.get("summary", {})
         balance_block = parsed_data.get("balance", {})
@@ -444,14 +957,18 @@ class MT5MongoDB:
         balance_chart = balance_block.get("chart", []) or []
 
         breaches = []
-        consecutive_inactive_days = 0  # Initialize for metrics
+
+        # One pass over the balance chart covers max loss, daily drawdown and inactivity
+        chart_analysis = self._analyze_balance_chart(balance_chart, rules, initial_balance)
 
         # Maximum loss limit check (critical)
         if initial_balance > 0:
-            min_balance = min((pt.get("y", [0, 0])[0] for pt in balance_chart), default=current_balance)
-            min_equity = min((pt.get("y", [0, 0])[1] for pt in balance_chart), default=current_equity)
+            min_balance = chart_analysis["min_balance"]
+            min_equity = chart_analysis["min_equity"]
+            if min_balance is None:
+                min_balance, min_equity = current_balance, current_equity
             worst_value = min(min_balance, min_equity)
-            threshold = initial_balance * (1 - rules["max_loss_limit"])
+            threshold = initial_balance * self.RULE_FACTORS[program]["max_loss"]
             if worst_value < threshold:
                 breaches.append(
                     {
@@ -465,9 +982,8 @@ class MT5MongoDB:
 
         # Daily Drawdown check (critical)
         # Checks ALL days: if equity dropped more than allowed % from the PEAK equity reached during each day
-        daily_dd_breached, daily_dd_details = self._check_daily_drawdown(
-            balance_chart, rules["daily_loss_limit"], initial_balance
-        )
+        daily_dd_breached = chart_analysis["daily_dd_breached"]
+        daily_dd_details = chart_analysis["daily_dd_details"]
         if daily_dd_breached:
             breach_date = daily_dd_details.get("breach_date", "unknown")
             peak = daily_dd_details.get("peak_equity", 0)
@@ -486,10 +1002,8 @@ class MT5MongoDB:
             )
 
         # Inactivity breach check (critical) - consecutive days with no equity change
-        inactivity_breached, consecutive_inactive_days = self._check_inactivity_breach(
-            balance_chart, rules["max_inactivity_days"]
-        )
-        # consecutive_inactive_days is now set for metrics
+        inactivity_breached = chart_analysis["inactivity_breached"]
+        consecutive_inactive_days = chart_analysis["consecutive_inactive_days"]
         if inactivity_breached:
             breaches.append(
                 {
@@ -503,8 +1017,11 @@ class MT5MongoDB:
 
         # Minimum profitable days check (NOT a breach, only for UNDER REVIEW status)
         # Each day must have >= 1.5% profit (gaps allowed, not consecutive required)
-        profit_daily_chart = parsed_data.get("profitDaily", {}).get("chart", [])
-        profitable_days = self._count_profitable_days(profit_daily_chart, initial_balance)
+        # Needs a deposit to measure profit against (daily drawdown and inactivity do not)
+        profitable_days = 0
+        if initial_balance > 0:
+            profit_daily_chart = parsed_data.get("profitDaily", {}).get("chart", [])
+            profitable_days = self._count_profitable_days(profit_daily_chart, initial_balance)
 
         # Profit target
         profit_target_hit = False
@@ -552,6 +1069,10 @@ class MT5MongoDB:
 
         return evaluation
 
+    def _apply_template(self, parsed_data):
+        """Build the schema-shaped document body from parsed report data using _SCHEMA_TEMPLATE"""
+        return self._build_document(parsed_data)
+
     def transform_mt5_data(self, parsed_data, credential_key=None):
         """
         Transform parsed MT5 report data to match MongoDB schema
@@ -562,192 +1083,17 @@ class MT5MongoDB:
         Returns:
             Dictionary matching TradingAccount schema
         """
-        account_info = parsed_data.get('account', {})
-        summary = parsed_data.get('summary', {})
-        balance_data = parsed_data.get('balance', {})
-        growth_data = parsed_data.get('growth', {})
-        dividend_data = parsed_data.get('dividend', {})
-        profit_total = parsed_data.get('profitTotal', {})
-        profit_money = parsed_data.get('profitMoney', {})
-        profit_deals = parsed_data.get('profitDeals', {})
-        profit_daily = parsed_data.get('profitDaily', {})
-        profit_type = parsed_data.get('profitType', {})
-        long_short_total = parsed_data.get('longShortTotal', {})
-        long_short = parsed_data.get('longShort', {})
-        long_short_daily = parsed_data.get('longShortDaily', {})
-        long_short_indicators = parsed_data.get('longShortIndicators', {})
-        trade_type_total = parsed_data.get('tradeTypeTotal', {})
-        symbol_money = parsed_data.get('symbolMoney', {})
-        symbol_deals = parsed_data.get('symbolDeals', {})
-        symbol_indicators = parsed_data.get('symbolIndicators', {})
-        symbols_total = parsed_data.get('symbolsTotal', {})
-        symbol_types = parsed_data.get('symbolTypes', {})
-        drawdown = parsed_data.get('drawdown', {})
-        risks_indicators = parsed_data.get('risksIndicators', {})
-        risks_mfe_mae_percent = parsed_data.get('risksMfeMaePercent', {})
-        risks_mfe_mae_money = parsed_data.get('risksMfeMaeMoney', {})
-        summary_indicators = parsed_data.get('summaryIndicators', {})
-        
         evaluation = self._evaluate_account(parsed_data, credential_key)
         
         # Build the document according to schema
-        document = {
-            'name': account_info.get('name', ''),
-            'currency': account_info.get('currency', 'USD'),
-            'type': account_info.get('type', 'demo'),
-            'broker': account_info.get('broker', ''),
-            'account': account_info.get('account', 0),
-            'digits': account_info.get('digits', 2),
-            'summary': {
-                'gain': summary.get('gain', 0),
-                'activity': summary.get('activity', 0),
-                'deposit': summary.get('deposit', [0, 0]),
-                'withdrawal': summary.get('withdrawal', [0, 0]),
-                'dividend': summary.get('dividend', 0),
-                'correction': summary.get('correction', 0),
-                'credit': summary.get('credit', 0)
-            },
-            'summaryIndicators': {
-                'sharp_ratio': summary_indicators.get('sharp_ratio'),
-                'profit_factor': summary_indicators.get('profit_factor'),
-                'recovery_factor': summary_indicators.get('recovery_factor'),
-                'drawdown': summary_indicators.get('drawdown'),
-                'deposit_load': summary_indicators.get('deposit_load'),
-                'trades_per_week': summary_indicators.get('trades_per_week'),
-                'hold_time': summary_indicators.get('hold_time')
-            },
-            'balance': {
-                'balance': balance_data.get('balance', 0),
-                'equity': balance_data.get('equity', 0),
-                'period': balance_data.get('period', 0),
-                'chart': balance_data.get('chart', []),
-                'table': balance_data.get('table', {'years': [], 'total': 0})
-            },
-            'growth': {
-                'growth': growth_data.get('growth', 0),
-                'drawdown': growth_data.get('drawdown', 0),
-                'period': growth_data.get('period', 0),
-                'chart': growth_data.get('chart', []),
-                'table': growth_data.get('table', {'years': [], 'total': 0})
-            },
-            'dividend': {
-                'dividend': dividend_data.get('dividend', 0),
-                'correction': dividend_data.get('correction', 0),
-                'credit': dividend_data.get('credit', 0),
-                'period': dividend_data.get('period', 0),
-                'chart': dividend_data.get('chart', []),
-                'table': dividend_data.get('table', {'years': [], 'total': 0})
-            },
-            'profitTotal': {
-                'profit': profit_total.get('profit', 0),
-                'profit_gross': profit_total.get('profit_gross', 0),
-                'profit_dividend': profit_total.get('profit_dividend', 0),
-                'profit_swap': profit_total.get('profit_swap', 0),
-                'loss': profit_total.get('loss', 0),
-                'loss_gross': profit_total.get('loss_gross', 0),
-                'loss_commission': profit_total.get('loss_commission', 0)
-            },
-            'profitMoney': {
-                'period': profit_money.get('period', 0),
-                'profit': profit_money.get('profit', []),
-                'loss': profit_money.get('loss', []),
-                'table': profit_money.get('table', {'years': [], 'total': 0})
-            },
-            'profitDeals': {
-                'period': profit_deals.get('period', 0),
-                'profit': profit_deals.get('profit', []),
-                'loss': profit_deals.get('loss', []),
-                'table': profit_deals.get('table', {'years': [], 'total': 0})
-            },
-            'profitDaily': {
-                'chart': profit_daily.get('chart', [])
-            },
-            'profitType': {
-                'robot': profit_type.get('robot', {'x': 0, 'y': [0, 0]}),
-                'manual': profit_type.get('manual', {'x': 0, 'y': [0, 0]}),
-                'signals': profit_type.get('signals', {'x': 0, 'y': [0, 0]})
-            },
-            'longShortTotal': {
-                'long': long_short_total.get('long', 0),
-                'short': long_short_total.get('short', 0)
-            },
-            'longShort': {
-                'period': long_short.get('period', 0),
-                'long': long_short.get('long', []),
-                'short': long_short.get('short', []),
-                'all': long_short.get('all', [])
-            },
-            'longShortDaily': {
-                'chart': long_short_daily.get('chart', [])
-            },
-            'longShortIndicators': {
-                'netto_pl': long_short_indicators.get('netto_pl', [0, 0]),
-                'average_pl': long_short_indicators.get('average_pl', [0, 0]),
-                'average_pl_percent': long_short_indicators.get('average_pl_percent', [0, 0]),
-                'commissions': long_short_indicators.get('commissions', [0, 0]),
-                'average_profit': long_short_indicators.get('average_profit', [0, 0]),
-                'average_profit_percent': long_short_indicators.get('average_profit_percent', [0, 0]),
-                'trades': long_short_indicators.get('trades', [0, 0]),
-                'win_trades': long_short_indicators.get('win_trades', [0, 0])
-            },
-            'tradeTypeTotal': {
-                'robots': trade_type_total.get('robots', 0),
-                'manual': trade_type_total.get('manual', 0),
-                'signals': trade_type_total.get('signals', 0)
-            },
-            'symbolMoney': {
-                'period': symbol_money.get('period', 0),
-                'chart': symbol_money.get('chart', [])
-            },
-            'symbolDeals': {
-                'period': symbol_deals.get('period', 0),
-                'chart': symbol_deals.get('chart', [])
-            },
-            'symbolIndicators': {
-                'profit_factor': symbol_indicators.get('profit_factor', []),
-                'netto_profit': symbol_indicators.get('netto_profit', []),
-                'fees': symbol_indicators.get('fees', [])
-            },
-            'symbolsTotal': {
-                'total': symbols_total.get('total', [])
-            },
-            'symbolTypes': {
-                'type': symbol_types.get('type', [])
-            },
-            'drawdown': {
-                'drawdown': drawdown.get('drawdown', 0),
-                'deposit_load': drawdown.get('deposit_load', 0),
-                'period': drawdown.get('period', 0),
-                'chart': drawdown.get('chart', [])
-            },
-            'credentialKey': credential_key,
-            'risksIndicators': {
-                'profit': risks_indicators.get('profit', [0, 0]),
-                'max_consecutive_trades': risks_indicators.get('max_consecutive_trades', [0, 0]),
-                'max_consecutive_profit': risks_indicators.get('max_consecutive_profit', [0, 0])
-            },
-            'risksMfeMaePercent': {
-                'max_avg_profit_ratio': risks_mfe_mae_percent.get('max_avg_profit_ratio', 0),
-                'max_avg_mfe_ratio': risks_mfe_mae_percent.get('max_avg_mfe_ratio', 0),
-                'min_avg_loss_ratio': risks_mfe_mae_percent.get('min_avg_loss_ratio', 0),
-                'min_avg_mae_ratio': risks_mfe_mae_percent.get('min_avg_mae_ratio', 0),
-                'period': risks_mfe_mae_percent.get('period', 0),
-                'chart': risks_mfe_mae_percent.get('chart', [])
-            },
-            'risksMfeMaeMoney': {
-                'max_avg_profit': risks_mfe_mae_money.get('max_avg_profit', 0),
-                'max_avg_mfe': risks_mfe_mae_money.get('max_avg_mfe', 0),
-                'min_avg_loss': risks_mfe_mae_money.get('min_avg_loss', 0),
-                'min_avg_mae': risks_mfe_mae_money.get('min_avg_mae', 0),
-                'period': risks_mfe_mae_money.get('period', 0),
-                'chart': risks_mfe_mae_money.get('chart', [])
-            },
-            # Evaluation-related fields (kept within credentials_reports)
-            'status': evaluation['status'],
-            'isBreached': evaluation['isBreached'],
-            'breachReasons': evaluation['breachReasons'],
-            'evaluation': evaluation
-        }
+        document = self._apply_template(parsed_data)
+        document['credentialKey'] = credential_key
+        
+        # Evaluation-related fields (kept within credentials_reports)
+        document['status'] = evaluation['status']
+        document['isBreached'] = evaluation['isBreached']
+        document['breachReasons'] = evaluation['breachReasons']
+        document['evaluation'] = evaluation
         
         return document
     
@@ -761,49 +1107,170 @@ class MT5MongoDB:
         Returns:
             The inserted/updated document ID
         """
-        # Derive credential key from credentialkeys collection using loginId/account
-        account_number = parsed_data.get('account', {}).get('account') or parsed_data.get('account')
-        credential_key = self._find_credential_key(account_number)
-
-        document = self.transform_mt5_data(parsed_data, credential_key)
-        account_number = document['account']
+        return self.insert_or_update_accounts([parsed_data])[0]
+    
+    def insert_or_update_accounts(self, parsed_data_list, batch_size=500):
+        """
+        Insert or update several trading accounts with unordered bulk writes
         
-        try:
-            # Use upsert to insert or update based on account number
-            result = self.collection.update_one(
-                {'account': account_number},
-                {
-                    '$set': document,
-                    '$currentDate': {'updatedAt': True}
-                },
-                upsert=True
-            )
+        Args:
+            parsed_data_list: List of dictionaries from parse_mt5_report function
+            batch_size: Number of upserts sent per bulk_write call
             
-            if result.upserted_id:
-                print(f"Inserted new account {account_number} into MongoDB")
-                return result.upserted_id
-            else:
-                print(f"Updated existing account {account_number} in MongoDB")
-                return account_number
-                
-        except DuplicateKeyError:
-            print(f"Warning: Account {account_number} already exists, updating...")
-            result = self.collection.replace_one(
-                {'account': account_number},
-                document
-            )
-            return account_number
-        except Exception as e:
-            print(f"Error: MongoDB operation failed: {e}")
+        Returns:
+            List of inserted/updated document IDs, in input order
+        """
+        account_numbers = []
+        for parsed_data in parsed_data_list:
+            acc = parsed_data.get('account')
+            account_numbers.append(acc.get('account') if type(acc) is dict else acc)
+        
+        # One credentialkeys query for the whole batch instead of one per account
+        self._prefetch_credential_keys(account_numbers)
+        
+        documents = []
+        for parsed_data, account_number in zip(parsed_data_list, account_numbers):
+            # Derive credential key from credentialkeys collection using loginId/account
+            credential_key = self._find_credential_key(account_number)
+            documents.append(self.transform_mt5_data(parsed_data, credential_key))
+        
+        ids = []
+        for i in range(0, len(documents), batch_size):
+            batch = documents[i:i + batch_size]
+            try:
+                result = self._bulk_write_documents(batch)
+            except PyMongoError as e:
+                log.error("MongoDB operation failed: %s", e)
+                raise
+            
+            # upserted_ids maps the operation index within the batch to the new _id
+            for j, document in enumerate(batch):
+                account_number = document['account']
+                if j in result.upserted_ids:
+                    log.info("Inserted new account %s into MongoDB", account_number)
+                    ids.append(result.upserted_ids[j])
+                else:
+                    log.info("Updated existing account %s in MongoDB", account_number)
+                    ids.append(account_number)
+        
+        return ids
+    
+    def _bulk_write_documents(self, documents):
+        """
+        Upsert transformed account documents keyed on the account number in one bulk_write.
+        The driver splits the request further if it exceeds the server's
+        message size or write batch limits.
+        """
+        stored = self._stored_section_hashes(documents)
+        
+        ops = []
+        written = {}
+        for doc in documents:
+            hashes = self._section_hashes(doc)
+            # A repeated account diffs against the earlier op in this batch, not the stored copy
+            previous = written.get(doc['account'], stored.get(doc['account'], {}))
+            # Unchanged sections are left out of $set (new accounts get everything);
+            # scalar fields are small and always written
+            changes = {
+                field: value for field, value in doc.items()
+                if field not in hashes or hashes[field] != previous.get(field)
+            }
+            changes['sectionHashes'] = hashes
+            written[doc['account']] = hashes
+            
+            # Upsert on the account number is idempotent, so no duplicate-key fallback is needed
+            ops.append(UpdateOne(
+                {'account': doc['account']},
+                {'$set': changes, '$currentDate': {'updatedAt': True}},
+                upsert=True
+            ))
+        
+        try:
+            # Unordered so the server can apply independent upserts in parallel; a batch that
+            # repeats an account must apply in order because each op diffs against the one before
+            result = self.collection.bulk_write(ops, ordered=len(written) < len(ops))
+        except PyMongoError:
+            # Some ops may not have applied; re-read these accounts' digests next time
+            for account_number in written:
+                self._section_hash_cache.pop(account_number, None)
             raise
+        self._section_hash_cache.update(written)
+        return result
+    
+    def _stored_section_hashes(self, documents):
+        """
+        sectionHashes of the stored accounts, fetched without the sections themselves.
+        Digests this handler wrote are reused; a single account it hasn't written yet
+        (main.py's per-report save) skips the read and gets a full $set.
+        """
+        stored = {}
+        missing = []
+        for doc in documents:
+            hashes = self._section_hash_cache.get(doc['account'])
+            if hashes is None:
+                missing.append(doc['account'])
+            else:
+                stored[doc['account']] = hashes
+        
+        if len(documents) > 1 and missing:
+            for doc in self.collection.find(
+                {'account': {'$in': missing}},
+                {'_id': 0, 'account': 1, 'sectionHashes': 1}
+            ):
+                stored[doc['account']] = doc.get('sectionHashes') or {}
+        return stored
+    
+    def _section_hashes(self, document):
+        """Digest of every embedded section (dict or list value) of a transformed document"""
+        return {
+            field: hashlib.blake2b(bson.encode({'v': value}), digest_size=16).hexdigest()
+            for field, value in document.items()
+            if isinstance(value, (dict, list))
+        }
     
     def get_account_by_number(self, account_number):
         """Retrieve an account by account number"""
         return self.collection.find_one({'account': account_number})
     
-    def get_all_accounts(self):
-        """Retrieve all trading accounts"""
-        return list(self.collection.find())
+    def get_all_accounts(self, projection=None):
+        """
+        Retrieve all trading accounts (as a list; use iter_accounts to stream them)
+        
+        Args:
+            projection: Optional MongoDB projection limiting the returned fields
+        """
+        return list(self.iter_accounts(projection=projection))
+    
+    def iter_accounts(self, batch_size=500, projection=None):
+        """
+        Stream all trading accounts without buffering the whole collection
+        
+        Args:
+            batch_size: Documents fetched per getMore round-trip
+            projection: Optional MongoDB projection limiting the returned fields
+            
+        Yields:
+            Account documents
+        """
+        yield from self.collection.find({}, projection).batch_size(batch_size)
+    
+    def get_top_by_gain(self, limit=5):
+        """
+        Retrieve the best performing accounts, sorted and limited by the server
+        
+        Args:
+            limit: Number of accounts to return
+            
+        Returns:
+            List of accounts (identity, summary.gain and balance.balance only), highest gain first
+        """
+        return list(
+            self.collection.find(
+                {},
+                {'_id': 0, 'account': 1, 'name': 1, 'currency': 1, 'broker': 1,
+                 'summary.gain': 1, 'balance.balance': 1}
+            ).sort('summary.gain', -1).limit(limit)
+        )
     
     def delete_account(self, account_number):
         """Delete an account by account number"""
@@ -827,72 +1294,138 @@ class MT5MongoDB:
         Returns:
             List of account dictionaries with login, password, and server
         """
+        # One server-side join instead of a reports lookup per credential:
+        # assigned credentials paired with the status of their report (if any)
+        pipeline = [
+            # Skip documents without any assigned credential before unwinding
+            {"$match": {"credentials": {"$elemMatch": {"isActive": {"$ne": True}}}}},
+            # Only the fields needed below are carried through the pipeline
+            {"$project": {
+                "_id": 0, "key": 1,
+                "credentials.loginId": 1, "credentials.isActive": 1, "credentials.password": 1,
+                "credentials.assignedTo": 1, "credentials.assignedOrderId": 1, "credentials.assignedAt": 1
+            }},
+            {"$unwind": "$credentials"},
+            {"$match": {"credentials.isActive": {"$ne": True}}},
+            {"$addFields": {
+                "_loginInt": {"$convert": {
+                    "input": "$credentials.loginId", "to": "long", "onError": None, "onNull": None
+                }}
+            }},
+            {"$lookup": {
+                "from": self.collection.name,
+                "localField": "_loginInt",
+                "foreignField": "account",
+                "pipeline": [{"$project": {"_id": 0, "status": 1}}],
+                "as": "report"
+            }}
+        ]
+        
         try:
-            # Find all documents in the credentials collection
-            credential_docs = list(self.credentials_collection.find())
+            unassigned = list(self.credentials_collection.aggregate([
+                {"$match": {"credentials.isActive": True}},
+                {"$project": {"_id": 0, "credentials.isActive": 1}},
+                {"$unwind": "$credentials"},
+                {"$match": {"credentials.isActive": True}},
+                {"$count": "count"}
+            ]))
+            skipped_unassigned = unassigned[0]["count"] if unassigned else 0
             
             active_accounts = []
             skipped_breached = 0
-            skipped_unassigned = 0
+            skipped_invalid = 0
             
-            for doc in credential_docs:
-                key = doc.get('key', 'Unknown')
-                credentials = doc.get('credentials', [])
+            # No index hint: "$ne: True" spans almost the whole isActive index, so the
+            # planner's choice is at least as good, and a missing index can't fail the query
+            # Rows are handled as each cursor batch arrives instead of being buffered first
+            for row in self.credentials_collection.aggregate(pipeline, batchSize=500):
+                key = row.get('key', 'Unknown')
+                cred = row['credentials']
+                login_id = cred.get('loginId')
+                account_number = row.get('_loginInt')
                 
-                for cred in credentials:
-                    is_active = cred.get('isActive', False)
-                    login_id = cred.get('loginId')
-                    
-                    # Only process ASSIGNED credentials (isActive: false)
-                    if is_active:
-                        skipped_unassigned += 1
-                        continue
-                    
-                    # Credential is assigned, check if it's already breached in reports
-                    try:
-                        # Convert loginId to int for lookup
-                        account_number = int(login_id) if login_id else None
-                        
-                        if account_number:
-                            # Check credentials_reports collection for existing status
-                            report = self.collection.find_one({'account': account_number})
-                            
-                            if report:
-                                status = report.get('status', '')
-                                # Skip if already breached
-                                if status == self.STATUS_BREACHED:
-                                    skipped_breached += 1
-                                    continue
-                                # Only include if status is ACTIVE
-                                if status != self.STATUS_ACTIVE:
-                                    continue
-                            
-                            # Account is either new (no report) or has ACTIVE status
-                            account = {
-                                'login': account_number,
-                                'password': cred['password'],
-                                'server': server_name,
-                                'key': key,  # Store the key for reference
-                                'assignedTo': cred.get('assignedTo'),
-                                'assignedOrderId': cred.get('assignedOrderId'),
-                                'assignedAt': cred.get('assignedAt')
-                            }
-                            active_accounts.append(account)
-                    except (ValueError, TypeError) as e:
-                        print(f"Warning: Invalid loginId '{login_id}' for key '{key}': {e}")
+                if not account_number:
+                    if login_id and account_number is None:
+                        log.debug("Invalid loginId '%s' for key '%s'", login_id, key)
+                        skipped_invalid += 1
+                    continue
+                
+                if row['report']:
+                    status = row['report'][0].get('status', '')
+                    # Skip if already breached
+                    if status == self.STATUS_BREACHED:
+                        skipped_breached += 1
                         continue
-                    except Exception as e:
-                        print(f"Warning: Error checking report for loginId '{login_id}': {e}")
+                    # Only include if status is ACTIVE
+                    if status != self.STATUS_ACTIVE:
                         continue
+                
+                # Account is either new (no report) or has ACTIVE status
+                try:
+                    account = {
+                        'login': account_number,
+                        'password': cred['password'],
+                        'server': server_name,
+                        'key': key,  # Store the key for reference
+                        'assignedTo': cred.get('assignedTo'),
+                        'assignedOrderId': cred.get('assignedOrderId'),
+                        'assignedAt': cred.get('assignedAt')
+                    }
+                except KeyError as e:
+                    log.debug("Missing field %s for loginId '%s' under key '%s'", e, login_id, key)
+                    skipped_invalid += 1
+                    continue
+                active_accounts.append(account)
             
-            print(f"Found {len(active_accounts)} credentials that need checking")
-            print(f"  - Skipped {skipped_unassigned} unassigned credentials (isActive: true)")
-            print(f"  - Skipped {skipped_breached} already breached credentials")
+            log.info("Found %d credentials that need checking", len(active_accounts))
+            log.info("  - Skipped %d unassigned credentials (isActive: true)", skipped_unassigned)
+            log.info("  - Skipped %d already breached credentials", skipped_breached)
+            if skipped_invalid:
+                # Per-credential details are logged at DEBUG level
+                log.warning("  - Skipped %d credentials with an invalid loginId or missing fields", skipped_invalid)
             return active_accounts
             
-        except Exception as e:
-            print(f"Error: Failed to fetch credentials from MongoDB: {e}")
-            return []
+        except PyMongoError as e:
+            # Raised rather than returning [], which would look like "nothing to check"
+            log.error("Failed to fetch credentials from MongoDB: %s", e)
+            raise
+    
+    def credentials_summary(self):
+        """
+        Bucket every credential by state on the server, grouped by credential key
+        
+        Buckets follow the automation's rules: eligible = active and not breached,
+        breached = isBreached (active or not), inactive = not active.
+        
+        Returns:
+            List of dicts with key, total, and the eligible/breached/inactive credential lists
+        """
+        credentials = {"$ifNull": ["$credentials", []]}
+        is_active = {"$eq": ["$$cred.isActive", True]}
+        is_breached = {"$eq": ["$$cred.isBreached", True]}
+        
+        def bucket(cond):
+            return {"$filter": {"input": credentials, "as": "cred", "cond": cond}}
+        
+        pipeline = [
+            {"$project": {
+                "_id": 0,
+                "key": {"$ifNull": ["$key", "Unknown"]},
+                "total": {"$size": credentials},
+                "eligible": bucket({"$and": [is_active, {"$not": [is_breached]}]}),
+                "breached": bucket(is_breached),
+                "inactive": bucket({"$not": [is_active]}),
+            }},
+            # Only the fields the credential viewer shows
+            {"$project": {
+                "key": 1, "total": 1,
+                "eligible.loginId": 1, "eligible.password": 1, "eligible.assignedTo": 1,
+                "eligible.assignedOrderId": 1, "eligible.lastChecked": 1,
+                "breached.loginId": 1, "breached.breachedMetadata": 1,
+                "inactive.loginId": 1, "inactive.assignedTo": 1,
+            }},
+        ]
+        return list(self.credentials_collection.aggregate(pipeline))
     
     def update_credential_status(self, login_id, key=None):
         """
@@ -905,56 +1438,127 @@ class MT5MongoDB:
         Returns:
             True if successful, False otherwise
         """
-        try:
-            from datetime import datetime
-            
-            # Build the query (handle numeric or string loginId) and match array element
-            login_variants = [str(login_id)]
-            try:
-                login_variants.append(int(login_id))
-            except Exception:
-                pass
-
-            query = {"credentials": {"$elemMatch": {"loginId": {"$in": login_variants}}}}
+        return self.update_credential_statuses([(login_id, key)]) > 0
+    
+    def _credential_status_queries(self, login_id, key=None):
+        """
+        Queries matching the credentialkeys array element for login_id.
+        Until the stored loginId type has been learned this is a single $in over
+        both forms; afterwards the stored form comes first and the other form
+        second, for documents that were not migrated.
+        """
+        variants = self._login_variants(login_id, narrow=False)
+        if len(variants) == 1:
+            values = variants
+        elif self._login_is_string is None:
+            values = [{"$in": variants}]
+        elif self._login_is_string:
+            values = variants
+        else:
+            values = variants[::-1]
+        
+        queries = []
+        for value in values:
+            # Dotted match: uses the loginId index and still drives the positional $ update
+            query = {"credentials.loginId": value}
             if key:
                 query["key"] = key
+            queries.append(query)
+        return queries
+
+    def normalize_login_ids(self):
+        """
+        Convert string credentials.loginId values to numbers (one-off migration).
+        loginIds that are not numeric are left unchanged.
+        
+        Returns:
+            Number of credential documents modified
+        """
+        to_number = {"$convert": {
+            "input": "$$cred.loginId", "to": "long", "onError": "$$cred.loginId", "onNull": "$$cred.loginId"
+        }}
+        result = self.credentials_collection.update_many(
+            {"credentials.loginId": {"$type": "string"}},
+            [{"$set": {"credentials": {"$map": {
+                "input": "$credentials",
+                "as": "cred",
+                "in": {"$mergeObjects": ["$$cred", {"loginId": to_number}]}
+            }}}}]
+        )
+        self._login_is_string = False
+        self.invalidate_credential_key()
+        log.info("Normalized loginIds in %d credential document(s)", result.modified_count)
+        return result.modified_count
+
+    def update_credential_statuses(self, login_ids):
+        """
+        Update the status of several credentials after processing in one bulk_write
+        
+        Args:
+            login_ids: Iterable of MT5 login IDs, or (login_id, key) pairs
             
-            # Update the credential
-            update_result = self.credentials_collection.update_one(
-                query,
-                {
-                    "$set": {
-                        "credentials.$.lastChecked": datetime.utcnow(),
-                        "credentials.$.isBreached": False,
-                        "credentials.$.breachedMetadata": "will be known soon",
-                        "updatedAt": datetime.utcnow()
-                    }
-                }
-            )
-            
-            if update_result.modified_count > 0:
-                print(f"Updated credential status for login {login_id}")
-                return True
-            else:
-                print(f"Warning: No credential found to update for login {login_id}")
-                return False
-                
-        except Exception as e:
-            print(f"Error: Failed to update credential status for login {login_id}: {e}")
-            return False
+        Returns:
+            Number of credentials updated
+        """
+        ops = []
+        legacy_ops = []
+        for item in login_ids:
+            login_id, key = item if isinstance(item, tuple) else (item, None)
+            queries = self._credential_status_queries(login_id, key)
+            ops.append(UpdateOne(queries[0], self._CREDENTIAL_CHECKED_UPDATE))
+            if len(queries) > 1:
+                legacy_ops.append(UpdateOne(queries[1], self._CREDENTIAL_CHECKED_UPDATE))
+        if not ops:
+            return 0
+        
+        try:
+            # Unordered: each update targets its own credential, so order does not matter
+            modified = self.credentials_collection.bulk_write(ops, ordered=False).modified_count
+            if modified < len(ops) and legacy_ops:
+                # Some logins missed; those stored with the other loginId type match only the other form
+                modified += self.credentials_collection.bulk_write(legacy_ops, ordered=False).modified_count
+        except PyMongoError as e:
+            log.error("Failed to update credential statuses: %s", e)
+            return 0
+        
+        if modified < len(ops):
+            log.warning("No credential found to update for %d of %d login(s)", len(ops) - modified, len(ops))
+        if modified:
+            log.info("Updated credential status for %d login(s)", modified)
+        return modified
     
     def close(self):
-        """Close the MongoDB connection"""
-        self.client.close()
-        print("MongoDB connection closed")
+        """
+        Release this handler's MongoDB connection
+        
+        The underlying client is shared with other MT5MongoDB instances and stays
+        open; use shutdown_all() to close every cached client.
+        """
+        log.info("Released MongoDB handler (shared client stays open until shutdown_all())")
+
+    @classmethod
+    def shutdown_all(cls):
+        """Close all cached MongoDB clients"""
+        while _CLIENT_CACHE:
+            _, client = _CLIENT_CACHE.popitem()
+            client.close()
+
+
+MT5MongoDB._prepare_rules()
+MT5MongoDB._compile_template()
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    
     # Test the MongoDB connection
     try:
         db = MT5MongoDB()
         print("MongoDB connection test successful!")
+        if "--normalize-login-ids" in sys.argv[1:]:
+            db.normalize_login_ids()
         db.close()
+        MT5MongoDB.shutdown_all()
     except Exception as e:
         print(f"MongoDB connection test failed: {e}")
 
@@ -1,30 +1,72 @@
 import json
-import re
+import mmap
 import sys
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib decoder is used without it
+    orjson = None
+
+
+_MARKER = b"window.__report"
+_WHITESPACE = b" \t\n\r\f\v"
+
+
+def _skip_whitespace(html, idx):
+    """Index of the first non-whitespace byte at or after idx."""
+    while idx < len(html) and html[idx] in _WHITESPACE:
+        idx += 1
+    return idx
+
+
+def _find_report_object(html):
+    """
+    Offset of the "{" in the first `window.__report = {` assignment, or -1.
+    Earlier mentions of the marker (e.g. `if (window.__report)`) are skipped.
+    """
+    start_idx = html.find(_MARKER)
+    while start_idx != -1:
+        idx = _skip_whitespace(html, start_idx + len(_MARKER))
+        if html[idx:idx + 1] == b"=":
+            idx = _skip_whitespace(html, idx + 1)
+            if html[idx:idx + 1] == b"{":
+                return idx
+        start_idx = html.find(_MARKER, start_idx + len(_MARKER))
+    return -1
+
 
 def parse_mt5_report(html_file: str):
     """Parse an MT5 HTML report and return parsed data."""
-    with open(html_file, "r", encoding="utf-8") as f:
-        html = f.read()
-
-    # === EXTRACT JSON FROM window.__report ===
-    match = re.search(r"window\.__report\s*=\s*(\{.*?\})\s*(?:<\/script>|;)", html, re.DOTALL)
-    if not match:
-        start_idx = html.find("window.__report")
-        if start_idx == -1:
+    # mmap the report so the scan runs over the page cache instead of a full in-memory copy
+    with open(html_file, "rb") as f:
+        if f.seek(0, 2) == 0:
             raise ValueError("Error: Could not find 'window.__report' in HTML.")
-        json_start = html.find("{", start_idx)
-        json_end = html.find("};", json_start)
-        json_text = html[json_start:json_end + 1]
-    else:
-        json_text = match.group(1)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as html:
+            # === EXTRACT JSON FROM window.__report ===
+            # Plain substring searches (linear, no regex backtracking): the object
+            # runs from the "{" of the assignment to the end of its <script>
+            json_start = _find_report_object(html)
+            if json_start == -1:
+                raise ValueError("Error: Could not find 'window.__report' in HTML.")
+            script_end = html.find(b"</script>", json_start)
+            json_text = html[json_start:script_end if script_end != -1 else len(html)]
+
+    # Both decoders take the UTF-8 bytes directly, so no str copy is made
+    json_text = json_text.rstrip().rstrip(b";").rstrip()
 
-    json_text = json_text.strip()
-    if not json_text.endswith("}"):
-        json_text = json_text[:json_text.rfind("}") + 1]
+    if orjson is not None:
+        try:
+            return orjson.loads(json_text)
+        except orjson.JSONDecodeError:
+            # orjson is stricter (e.g. NaN literals, huge integers); let json decide
+            pass
 
-    data = json.loads(json_text)
+    try:
+        data = json.loads(json_text)
+    except json.JSONDecodeError:
+        # More script follows the object: decode just the leading JSON value,
+        # which matches braces while respecting string contents
+        data, _ = json.JSONDecoder().raw_decode(json_text.decode("utf-8"))
     return data
 
 
@@ -1,24 +1,30 @@
 """
 Utility script to query and display trading accounts from MongoDB
 """
+import logging
+import sys
 from mongo_db import MT5MongoDB
 import config
 from datetime import datetime
 import json
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; exports fall back to the stdlib encoder
+    orjson = None
+
 
 def display_account_summary(account):
     """Display a summary of a trading account"""
-    acc_info = account.get('account', {})
     summary = account.get('summary', {})
     balance = account.get('balance', {})
     
     print("\n" + "=" * 70)
-    print(f"Account: {acc_info.get('account')} - {acc_info.get('name')}")
+    print(f"Account: {account.get('account')} - {account.get('name')}")
     print("=" * 70)
-    print(f"Broker:          {acc_info.get('broker')}")
-    print(f"Type:            {acc_info.get('type')}")
-    print(f"Currency:        {acc_info.get('currency')}")
+    print(f"Broker:          {account.get('broker')}")
+    print(f"Type:            {account.get('type')}")
+    print(f"Currency:        {account.get('currency')}")
     print(f"Balance:         {balance.get('balance', 0):.2f}")
     print(f"Equity:          {balance.get('equity', 0):.2f}")
     print(f"Gain:            {summary.get('gain', 0):.2f}%")
@@ -40,46 +46,48 @@ def display_account_summary(account):
         print(f"\nLast Updated:    {account['updatedAt']}")
 
 
-def list_all_accounts():
+def _format_account(i, account):
+    """Format one numbered entry of the account listing (ends with a blank line)"""
+    balance = account.get('balance', {})
+    summary = account.get('summary', {})
+    
+    return (
+        f"{i}. Account {account.get('account')} - {account.get('name')}\n"
+        f"   Balance: {balance.get('balance', 0):.2f} {account.get('currency', 'USD')}\n"
+        f"   Gain: {summary.get('gain', 0):.2f}%\n"
+        f"   Broker: {account.get('broker')}\n"
+        "\n"
+    )
+
+
+def list_all_accounts(db):
     """List all trading accounts in MongoDB"""
     print("\n" + "=" * 70)
     print("ALL TRADING ACCOUNTS IN DATABASE")
     print("=" * 70)
     
-    db = MT5MongoDB(connection_string=config.MONGODB_URI, database_name=config.MONGODB_DATABASE)
-    
-    accounts = db.get_all_accounts()
+    # Only the fields listed below; skips the chart arrays
+    accounts = db.get_all_accounts(projection={
+        '_id': 0, 'account': 1, 'name': 1, 'currency': 1, 'broker': 1,
+        'summary.gain': 1, 'balance.balance': 1
+    })
     
     if not accounts:
         print("\nNo accounts found in database")
-        db.close()
         return
     
     print(f"\nFound {len(accounts)} account(s)\n")
     
-    for i, account in enumerate(accounts, 1):
-        acc_info = account.get('account', {})
-        balance = account.get('balance', {})
-        summary = account.get('summary', {})
-        
-        print(f"{i}. Account {acc_info.get('account')} - {acc_info.get('name')}")
-        print(f"   Balance: {balance.get('balance', 0):.2f} {acc_info.get('currency', 'USD')}")
-        print(f"   Gain: {summary.get('gain', 0):.2f}%")
-        print(f"   Broker: {acc_info.get('broker')}")
-        print()
-    
-    db.close()
+    # Written in one call instead of one print() per line
+    sys.stdout.write("".join(_format_account(i, account) for i, account in enumerate(accounts, 1)))
 
 
-def get_account_details(account_number):
+def get_account_details(db, account_number):
     """Get detailed information for a specific account"""
-    db = MT5MongoDB(connection_string=config.MONGODB_URI, database_name=config.MONGODB_DATABASE)
-    
     account = db.get_account_by_number(account_number)
     
     if not account:
         print(f"\nAccount {account_number} not found in database")
-        db.close()
         return
     
     display_account_summary(account)
@@ -94,48 +102,57 @@ def get_account_details(account_number):
         if '_id' in account:
             del account['_id']
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(account, f, indent=2, default=str)
+        if orjson is not None:
+            # Datetimes/ObjectIds go through str() like the json fallback, so the output matches
+            data = orjson.dumps(account, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_PASSTHROUGH_DATETIME)
+            with open(filename, 'wb') as f:
+                f.write(data)
+        else:
+            with open(filename, 'w', encoding='utf-8') as f:
+                json.dump(account, f, indent=2, default=str)
         
         print(f"Exported to {filename}")
-    
-    db.close()
 
 
-def get_top_performers(limit=5):
+def get_top_performers(db, limit=5):
     """Get top performing accounts by gain"""
     print("\n" + "=" * 70)
     print(f"TOP {limit} PERFORMING ACCOUNTS")
     print("=" * 70)
     
-    db = MT5MongoDB(connection_string=config.MONGODB_URI, database_name=config.MONGODB_DATABASE)
-    
-    # Get all accounts and sort by gain
-    accounts = db.get_all_accounts()
+    # Sorted and limited by MongoDB (summary.gain index), so only `limit` accounts are fetched
+    accounts = db.get_top_by_gain(limit)
     
     if not accounts:
         print("\nNo accounts found in database")
-        db.close()
         return
     
-    # Sort by gain
-    sorted_accounts = sorted(accounts, key=lambda x: x.get('summary', {}).get('gain', 0), reverse=True)
-    
-    for i, account in enumerate(sorted_accounts[:limit], 1):
-        acc_info = account.get('account', {})
+    # Written in one call instead of one print() per line
+    out = []
+    for i, account in enumerate(accounts, 1):
         summary = account.get('summary', {})
         balance = account.get('balance', {})
         
-        print(f"\n{i}. Account {acc_info.get('account')} - {acc_info.get('name')}")
-        print(f"   Gain:     {summary.get('gain', 0):.2f}%")
-        print(f"   Balance:  {balance.get('balance', 0):.2f} {acc_info.get('currency', 'USD')}")
-        print(f"   Broker:   {acc_info.get('broker')}")
-    
-    db.close()
+        out.append(f"\n{i}. Account {account.get('account')} - {account.get('name')}")
+        out.append(f"   Gain:     {summary.get('gain', 0):.2f}%")
+        out.append(f"   Balance:  {balance.get('balance', 0):.2f} {account.get('currency', 'USD')}")
+        out.append(f"   Broker:   {account.get('broker')}")
+    sys.stdout.write("\n".join(out) + "\n")
 
 
 def main():
     """Main menu for querying accounts"""
+    # One handler for the whole session; every menu action reuses its connection
+    db = MT5MongoDB(connection_string=config.MONGODB_URI, database_name=config.MONGODB_DATABASE)
+    try:
+        _menu_loop(db)
+    finally:
+        db.close()
+        MT5MongoDB.shutdown_all()
+
+
+def _menu_loop(db):
+    """Prompt for menu choices until the user exits"""
     while True:
         print("\n" + "=" * 70)
         print("MT5 TRADING ACCOUNTS - QUERY TOOL")
@@ -148,12 +165,12 @@ def main():
         choice = input("\nEnter your choice (1-4): ").strip()
         
         if choice == '1':
-            list_all_accounts()
+            list_all_accounts(db)
         
         elif choice == '2':
             try:
                 account_num = int(input("\nEnter account number: ").strip())
-                get_account_details(account_num)
+                get_account_details(db, account_num)
             except ValueError:
                 print("Invalid account number")
         
@@ -161,7 +178,7 @@ def main():
             try:
                 limit = input("\nHow many top accounts to show? (default 5): ").strip()
                 limit = int(limit) if limit else 5
-                get_top_performers(limit)
+                get_top_performers(db, limit)
             except ValueError:
                 print("Invalid number")
         
@@ -174,6 +191,8 @@ def main():
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    
     try:
         main()
     except KeyboardInterrupt:
@@ -0,0 +1,47 @@
+"""
+Import-time checks for the optional numba drawdown kernel in mongo_db
+"""
+import importlib
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _fresh_import():
+    """Import mongo_db from scratch, restoring the previously loaded module afterwards"""
+    previous = sys.modules.pop("mongo_db", None)
+    try:
+        return importlib.import_module("mongo_db")
+    finally:
+        if previous is not None:
+            sys.modules["mongo_db"] = previous
+        else:
+            sys.modules.pop("mongo_db", None)
+
+
+class DrawdownKernelImportTest(unittest.TestCase):
+
+    def test_import_without_cache_locator(self):
+        """Frozen/zipped builds: numba can't locate the source to cache the kernel"""
+        try:
+            from numba.core.caching import CacheImpl
+        except ImportError:
+            self.skipTest("numba is not installed")
+
+        with mock.patch.object(CacheImpl, "_locator_classes", []):
+            mongo_db = _fresh_import()
+
+        self.assertIsNotNone(mongo_db._drawdown_scan_kernel)
+
+    def test_import_without_numba(self):
+        with mock.patch.dict(sys.modules, {"numba": None}):
+            mongo_db = _fresh_import()
+
+        self.assertIsNone(mongo_db._drawdown_scan_kernel)
+
+
+if __name__ == "__main__":
+    unittest.main()
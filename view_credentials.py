@@ -1,6 +1,8 @@
 """
 Helper script to view credentials from MongoDB
 """
+import logging
+import sys
 from mongo_db import MT5MongoDB
 import config
 
@@ -17,9 +19,9 @@ def view_all_credentials():
             database_name=config.MONGODB_DATABASE
         )
         
-        # Get all credential documents
+        # Credentials come back already bucketed per key by the server
         print("\nFetching credentials from 'credentialkeys' collection...")
-        credential_docs = list(mongo_db.credentials_collection.find())
+        credential_docs = mongo_db.credentials_summary()
         
         if not credential_docs:
             print("No credential documents found!")
@@ -30,60 +32,61 @@ def view_all_credentials():
         
         total_active = 0
         total_inactive = 0
+        total_breached = 0
         
+        # Output is collected and written once instead of one print() per line
+        out = []
         for doc in credential_docs:
-            key = doc.get('key', 'Unknown')
-            credentials = doc.get('credentials', [])
+            key = doc['key']
+            eligible_creds = doc['eligible']
+            breached_creds = doc['breached']
+            inactive_creds = doc['inactive']
             
-            print("=" * 80)
-            print(f"Key: {key}")
-            print(f"Total Credentials: {len(credentials)}")
-            print("=" * 80)
+            out.append("=" * 80)
+            out.append(f"Key: {key}")
+            out.append(f"Total Credentials: {doc['total']}")
+            out.append("=" * 80)
             
-            active_creds = [c for c in credentials if c.get('isActive', False)]
-            inactive_creds = [c for c in credentials if not c.get('isActive', False)]
-            breached_creds = [c for c in credentials if c.get('isBreached', False)]
-            eligible_creds = [c for c in active_creds if not c.get('isBreached', False)]
-            
-            print(f"\nActive & Eligible Credentials ({len(eligible_creds)}):")
+            out.append(f"\nActive & Eligible Credentials ({len(eligible_creds)}):")
             if eligible_creds:
                 for cred in eligible_creds:
-                    print(f"  • Login: {cred['loginId']}")
-                    print(f"    Password: {'*' * len(cred['password'])}")
+                    out.append(f"  • Login: {cred['loginId']}")
+                    out.append(f"    Password: {'*' * len(cred['password'])}")
                     if cred.get('assignedTo'):
-                        print(f"    Assigned: {cred['assignedTo']}")
+                        out.append(f"    Assigned: {cred['assignedTo']}")
                     if cred.get('assignedOrderId'):
-                        print(f"    Order ID: {cred['assignedOrderId']}")
+                        out.append(f"    Order ID: {cred['assignedOrderId']}")
                     if cred.get('lastChecked'):
-                        print(f"    Last Checked: {cred['lastChecked']}")
-                    print()
+                        out.append(f"    Last Checked: {cred['lastChecked']}")
+                    out.append("")
             else:
-                print("  (No eligible credentials)\n")
+                out.append("  (No eligible credentials)\n")
             
             if breached_creds:
-                print(f"Breached Credentials ({len(breached_creds)}) - Will NOT be processed:")
+                out.append(f"Breached Credentials ({len(breached_creds)}) - Will NOT be processed:")
                 for cred in breached_creds:
-                    print(f"  • Login: {cred['loginId']}")
+                    out.append(f"  • Login: {cred['loginId']}")
                     if cred.get('breachedMetadata'):
-                        print(f"    Reason: {cred['breachedMetadata']}")
-                    print()
+                        out.append(f"    Reason: {cred['breachedMetadata']}")
+                    out.append("")
             
-            print(f"Inactive Credentials ({len(inactive_creds)}):")
+            out.append(f"Inactive Credentials ({len(inactive_creds)}):")
             if inactive_creds:
                 for cred in inactive_creds:
-                    print(f"  • Login: {cred['loginId']}")
+                    out.append(f"  • Login: {cred['loginId']}")
                     if cred.get('assignedTo'):
-                        print(f"    Assigned: {cred['assignedTo']}")
-                    print()
+                        out.append(f"    Assigned: {cred['assignedTo']}")
+                    out.append("")
             else:
-                print("  (No inactive credentials)\n")
+                out.append("  (No inactive credentials)\n")
             
             total_active += len(eligible_creds)
             total_inactive += len(inactive_creds)
+            total_breached += len(breached_creds)
         
-        # Summary
-        total_breached = sum(1 for doc in credential_docs for c in doc.get('credentials', []) if c.get('isBreached', False))
+        sys.stdout.write("\n".join(out) + "\n")
         
+        # Summary
         print("\n" + "=" * 80)
         print("SUMMARY")
         print("=" * 80)
@@ -98,10 +101,12 @@ def view_all_credentials():
         print("Reports will be saved to collection: 'credentials_reports'")
         active_accounts = mongo_db.get_active_credentials(server_name=config.SERVER)
         if active_accounts:
+            out = []
             for i, account in enumerate(active_accounts, 1):
-                print(f"  {i}. Login: {account['login']} | Key: {account['key']}")
+                out.append(f"  {i}. Login: {account['login']} | Key: {account['key']}")
                 if account.get('assignedTo'):
-                    print(f"     Assigned to: {account['assignedTo']}")
+                    out.append(f"     Assigned to: {account['assignedTo']}")
+            sys.stdout.write("\n".join(out) + "\n")
         else:
             print("  (None - no active credentials found)")
         
@@ -131,15 +136,17 @@ def view_active_only():
             print("\nNo active credentials found!")
         else:
             print(f"\nFound {len(active_accounts)} active credential(s):\n")
+            out = []
             for i, account in enumerate(active_accounts, 1):
-                print(f"{i}. Login: {account['login']}")
-                print(f"   Server: {account['server']}")
-                print(f"   Key: {account['key']}")
+                out.append(f"{i}. Login: {account['login']}")
+                out.append(f"   Server: {account['server']}")
+                out.append(f"   Key: {account['key']}")
                 if account.get('assignedTo'):
-                    print(f"   Assigned to: {account['assignedTo']}")
+                    out.append(f"   Assigned to: {account['assignedTo']}")
                 if account.get('assignedOrderId'):
-                    print(f"   Order ID: {account['assignedOrderId']}")
-                print()
+                    out.append(f"   Order ID: {account['assignedOrderId']}")
+                out.append("")
+            sys.stdout.write("\n".join(out) + "\n")
         
         mongo_db.close()
         
@@ -148,11 +155,15 @@ def view_active_only():
 
 
 if __name__ == "__main__":
-    import sys
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     
-    if len(sys.argv) > 1 and sys.argv[1] == "--active-only":
-        view_active_only()
-    else:
-        view_all_credentials()
-        print("\nTip: Run with --active-only flag to see only active credentials")
+    try:
+        if len(sys.argv) > 1 and sys.argv[1] == "--active-only":
+            view_active_only()
+        else:
+            view_all_credentials()
+            print("\nTip: Run with --active-only flag to see only active credentials")
+    finally:
+        # close() only releases the handler; this closes the shared client
+        MT5MongoDB.shutdown_all()
 